@@ -4,17 +4,167 @@ Simple setup script for native frappe-bench with container backend services
 Usage: cd development && source ../.venv/bin/activate && python installer-local.py
 """
 import argparse
+import asyncio
+import fcntl
+import json
 import os
+import platform
+import pty
+import re
+import shutil
+import socket
+import stat
 import subprocess
 import sys
+import tempfile
+import termios
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache, partial
+
+# Serializes output from checks running on worker threads
+_print_lock = threading.Lock()
+
+_CPRINT_PREFIX = {1: "\033[31m ", 2: "\33[92m ", 3: "\33[93m "}  # red, green, yellow
+_CPRINT_SUFFIX = " \033[0m\n"
+
+_SYSTEM = platform.system()
+
+# Holds the mariadb TCP wrapper; prepended to PATH for bench together with the
+# Homebrew mysql-client bin dir
+_LOCAL_BIN = os.path.expanduser('~/bin')
+_MYSQL_CLIENT_BIN = '/opt/homebrew/opt/mysql-client/bin'
+
+_MYSQL_INSTALL_HINT = {
+    "Darwin": "Try: brew install mysql-client",
+    "Linux": "Try: apt install mysql-client or yum install mysql",
+}
+
+# Homebrew opt directories and mysql formulae, in order of preference (macOS)
+_HOMEBREW_OPT_DIRS = ('/opt/homebrew/opt', '/usr/local/opt')  # Apple Silicon, Intel Mac
+_HOMEBREW_MYSQL_FORMULAE = ('mysql-client', 'mysql')
+
+# A site_config.json db_host that still points at the container or the socket
+_STALE_DB_HOST_RE = re.compile(rb'"db_host"\s*:\s*"(mariadb|localhost)"')
 
 
 def cprint(message, level=1):
     """Print colored messages"""
-    colors = {1: "\033[31m", 2: "\33[92m", 3: "\33[93m"}  # red, green, yellow
-    reset = "\033[0m"
-    color = colors.get(level, colors[1])
-    print(f"{color} {message} {reset}")
+    prefix = _CPRINT_PREFIX.get(level, _CPRINT_PREFIX[1])
+    with _print_lock:
+        sys.stdout.write(prefix)
+        sys.stdout.write(str(message))
+        sys.stdout.write(_CPRINT_SUFFIX)
+
+
+@lru_cache(maxsize=None)
+def _which(name):
+    """Locate an executable on PATH; call _which.cache_clear() after changing PATH"""
+    return shutil.which(name)
+
+
+@lru_cache(maxsize=1)
+def _find_homebrew_mysql():
+    """Return the preferred Homebrew mysql prefix that ships bin/mysql, or None"""
+    # Read each opt dir once, then only stat the candidates that are installed
+    installed = {}
+    for opt_dir in _HOMEBREW_OPT_DIRS:
+        try:
+            with os.scandir(opt_dir) as entries:
+                installed[opt_dir] = {entry.name for entry in entries}
+        except OSError:
+            installed[opt_dir] = set()
+
+    for formula in _HOMEBREW_MYSQL_FORMULAE:
+        for opt_dir in _HOMEBREW_OPT_DIRS:
+            path = f'{opt_dir}/{formula}'
+            if formula in installed[opt_dir] and os.path.exists(f'{path}/bin/mysql'):
+                return path
+    return None
+
+
+@lru_cache(maxsize=1)
+def _bench_env():
+    """Environment for bench subprocesses, built once PATH has been set up"""
+    path = os.environ.get('PATH', '')
+    return {**os.environ, 'PATH': f"{_LOCAL_BIN}:{_MYSQL_CLIENT_BIN}:{path}"}
+
+
+def run_checks(*checks):
+    """Run independent prerequisite checks concurrently, return True if all pass"""
+    with ThreadPoolExecutor() as executor:
+        futures = [executor.submit(check) for check in checks]
+        results = [future.result() for future in as_completed(futures)]
+    return all(results)
+
+
+def _open_pty():
+    """Open a pty sized like our terminal, return (master, slave)"""
+    master, slave = pty.openpty()
+    try:
+        winsize = fcntl.ioctl(sys.stdout.fileno(), termios.TIOCGWINSZ, b'\0' * 8)
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, winsize)
+        # Keep plain \n line endings so the log file matches what bench wrote
+        attrs = termios.tcgetattr(slave)
+        attrs[1] &= ~termios.ONLCR
+        termios.tcsetattr(slave, termios.TCSANOW, attrs)
+    except OSError:
+        pass
+    return master, slave
+
+
+def _read_pty(master):
+    """Read a chunk from a pty master, b'' once the child side is closed"""
+    try:
+        return os.read(master, 65536)
+    except OSError:  # EIO on Linux after the last writer exits
+        return b''
+
+
+async def run_logged(cmd, log_name, cwd, env=None):
+    """Run a long bench command, echoing its output live and keeping a copy in
+    {cwd}/logs/{log_name}.log; return the exit code"""
+    log_dir = os.path.join(cwd, 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    log_path = os.path.join(log_dir, f'{log_name}.log')
+
+    master = None
+    if sys.stdout.isatty():
+        # Give the child a terminal of its own: git, pip and yarn only show
+        # progress when writing to a tty
+        master, slave = _open_pty()
+        try:
+            process = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, env=env, stdout=slave, stderr=slave)
+        except OSError:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        read_chunk = partial(asyncio.to_thread, _read_pty, master)
+    else:
+        # Not on a terminal ourselves, so neither was the child before
+        process = await asyncio.create_subprocess_exec(
+            *cmd, cwd=cwd, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT
+        )
+        read_chunk = partial(process.stdout.read, 65536)
+
+    # Copy fixed-size chunks rather than lines; nothing is kept once written out
+    try:
+        with open(log_path, 'wb') as log:
+            while chunk := await read_chunk():
+                log.write(chunk)
+                with _print_lock:
+                    sys.stdout.flush()
+                    sys.stdout.buffer.write(chunk)
+                    sys.stdout.buffer.flush()
+    finally:
+        if master is not None:
+            os.close(master)
+
+    returncode = await process.wait()
+    if returncode != 0:
+        cprint(f"Full output saved to {log_path}", 3)
+    return returncode
 
 
 def check_uv_environment():
@@ -27,53 +177,31 @@ def check_uv_environment():
     if 'frappe_docker/.venv' not in venv_path:
         cprint(f"WARNING: Unexpected venv path: {venv_path}", 3)
 
-    try:
-        result = subprocess.run(['which', 'bench'], capture_output=True, text=True)
-        if result.returncode == 0:
-            cprint("✓ frappe-bench available", 2)
-            return True
-        else:
-            cprint("ERROR: bench not found. Run: uv add frappe-bench", 1)
-            return False
-    except:
-        cprint("ERROR: Could not check bench availability", 1)
+    if _which('bench'):
+        cprint("✓ frappe-bench available", 2)
+        return True
+    else:
+        cprint("ERROR: bench not found. Run: uv add frappe-bench", 1)
         return False
 
 
 def check_mysql_client():
     """Check if mysql client is available (system PATH or Homebrew)"""
     # First try to find mysql in system PATH
-    try:
-        result = subprocess.run(['which', 'mysql'], capture_output=True, text=True)
-        if result.returncode == 0:
-            mysql_path = result.stdout.strip()
-            cprint(f"✓ mysql client found in PATH: {mysql_path}", 2)
-            return True
-    except:
-        pass
+    mysql_path = _which('mysql')
+    if mysql_path:
+        cprint(f"✓ mysql client found in PATH: {mysql_path}", 2)
+        return True
 
     # Fall back to Homebrew locations (macOS)
-    homebrew_paths = [
-        '/opt/homebrew/opt/mysql-client/bin/mysql',  # Apple Silicon
-        '/usr/local/opt/mysql-client/bin/mysql',     # Intel Mac
-        '/opt/homebrew/opt/mysql/bin/mysql',         # Full MySQL
-        '/usr/local/opt/mysql/bin/mysql'             # Intel MySQL
-    ]
-
-    for mysql_binary in homebrew_paths:
-        if os.path.exists(mysql_binary):
-            cprint(f"✓ mysql client found via Homebrew: {mysql_binary}", 2)
-            return True
+    homebrew_mysql = _find_homebrew_mysql()
+    if homebrew_mysql:
+        cprint(f"✓ mysql client found via Homebrew: {homebrew_mysql}/bin/mysql", 2)
+        return True
 
     # If nothing found, provide platform-appropriate suggestions
-    import platform
-    system = platform.system()
-    if system == "Darwin":  # macOS
-        cprint("ERROR: mysql client not found. Try: brew install mysql-client", 1)
-    elif system == "Linux":
-        cprint("ERROR: mysql client not found. Try: apt install mysql-client or yum install mysql", 1)
-    else:
-        cprint("ERROR: mysql client not found. Please install MySQL client tools", 1)
+    hint = _MYSQL_INSTALL_HINT.get(_SYSTEM, "Please install MySQL client tools")
+    cprint(f"ERROR: mysql client not found. {hint}", 1)
 
     return False
 
@@ -81,120 +209,71 @@ def check_mysql_client():
 def check_database_service(db_type="mariadb"):
     """Check if database service is available (Docker or local)"""
     if db_type == "mariadb":
-        try:
-            # Find mysql binary (should be set up by setup_mysql_path)
-            mysql_binary = None
-            local_bin = os.path.expanduser('~/bin')
-            mariadb_script = os.path.join(local_bin, 'mariadb')
-
-            # Use the mariadb wrapper script we created
-            if os.path.exists(mariadb_script):
-                mysql_binary = mariadb_script
-            else:
-                # Try to find mysql in PATH
-                try:
-                    result = subprocess.run(['which', 'mysql'], capture_output=True, text=True)
-                    if result.returncode == 0:
-                        mysql_binary = result.stdout.strip()
-                except:
-                    pass
-
-            if not mysql_binary:
-                cprint("ERROR: MySQL client not available", 1)
-                return False
-
-            env = os.environ.copy()
-            env['PATH'] = f"{local_bin}:{env.get('PATH', '')}"
+        name, port = "MariaDB", 3306
+    else:  # postgresql
+        name, port = "PostgreSQL", 5432
 
-            # Test MariaDB connection
-            cmd = [mysql_binary, '--protocol=TCP', '-h', 'localhost', '-P', '3306', '-u', 'root', '-p123', '-e', 'SELECT 1;']
-            result = subprocess.run(cmd, capture_output=True, text=True, env=env, timeout=5)
+    # A plain TCP probe instead of spawning the mysql/psql client
+    try:
+        with socket.create_connection(('localhost', port), timeout=5) as sock:
+            if db_type == "mariadb":
+                # MySQL-protocol servers speak first: 3-byte length, sequence id,
+                # then protocol version 10 (an error packet starts with 0xff)
+                greeting = sock.recv(5)
+                if len(greeting) < 5 or greeting[4] != 10:
+                    cprint(f"ERROR: {name} service on localhost:{port} refused the connection", 1)
+                    return False
+    except socket.timeout:
+        cprint("ERROR: Database connection timeout", 1)
+        return False
+    except OSError:
+        cprint(f"ERROR: {name} service not available", 1)
+        cprint(f"💡 Ensure {name} is running on localhost:{port}", 3)
+        return False
 
-            if result.returncode == 0:
-                cprint("✓ MariaDB service available", 2)
-                return True
-            else:
-                cprint("ERROR: MariaDB service not available", 1)
-                cprint("💡 Ensure MariaDB/MySQL is running on localhost:3306", 3)
-                return False
-        except subprocess.TimeoutExpired:
-            cprint("ERROR: Database connection timeout", 1)
-            return False
-        except Exception as e:
-            cprint(f"ERROR: Could not test MariaDB service: {e}", 1)
-            return False
-    else:  # postgresql
-        try:
-            # Test PostgreSQL connection using psql
-            result = subprocess.run(['which', 'psql'], capture_output=True, text=True)
-            if result.returncode != 0:
-                cprint("WARNING: psql not found, skipping PostgreSQL connection test", 3)
-                return True  # Don't fail if psql not available
-
-            # Test PostgreSQL connection
-            env = os.environ.copy()
-            env['PGPASSWORD'] = '123'
-            cmd = ['psql', '-h', 'localhost', '-p', '5432', '-U', 'root', '-d', 'postgres', '-c', 'SELECT 1;']
-            result = subprocess.run(cmd, capture_output=True, text=True, env=env, timeout=5)
-
-            if result.returncode == 0:
-                cprint("✓ PostgreSQL service available", 2)
-                return True
-            else:
-                cprint("ERROR: PostgreSQL service not available", 1)
-                cprint("💡 Ensure PostgreSQL is running on localhost:5432", 3)
-                return False
-        except subprocess.TimeoutExpired:
-            cprint("ERROR: PostgreSQL connection timeout", 1)
-            return False
-        except Exception as e:
-            cprint(f"ERROR: Could not test PostgreSQL service: {e}", 1)
-            return False
+    cprint(f"✓ {name} service available", 2)
+    return True
 
 
+def check_redis_service():
+    """Check that the redis cache and queue ports are listening"""
+    available = True
+    for name, port in (("redis-cache", 6379), ("redis-queue", 6380)):
+        try:
+            with socket.create_connection(('localhost', port), timeout=2):
+                pass
+        except OSError:
+            cprint(f"WARNING: {name} not reachable on localhost:{port}", 3)
+            available = False
+    if available:
+        cprint("✓ Redis services available", 2)
+    return available
 
 
 def setup_mysql_path():
     """Setup MySQL client path and create TCP wrapper for cross-platform compatibility"""
-    import platform
-
     # Find mysql binary location
-    mysql_binary = None
     mysql_dir = None
 
     # First check system PATH
-    try:
-        result = subprocess.run(['which', 'mysql'], capture_output=True, text=True)
-        if result.returncode == 0:
-            mysql_binary = result.stdout.strip()
-            mysql_dir = os.path.dirname(mysql_binary)
-            cprint(f"✓ Using mysql from PATH: {mysql_binary}", 3)
-    except:
-        pass
+    mysql_binary = _which('mysql')
+    if mysql_binary:
+        mysql_dir = os.path.dirname(mysql_binary)
+        cprint(f"✓ Using mysql from PATH: {mysql_binary}", 3)
 
     # Fall back to platform-specific locations
     if not mysql_binary:
-        system = platform.system()
-        if system == "Darwin":  # macOS
-            homebrew_paths = [
-                '/opt/homebrew/opt/mysql-client',  # Apple Silicon
-                '/usr/local/opt/mysql-client',     # Intel Mac
-                '/opt/homebrew/opt/mysql',         # Full MySQL
-                '/usr/local/opt/mysql'             # Intel MySQL
-            ]
-            for path in homebrew_paths:
-                mysql_bin = f'{path}/bin/mysql'
-                if os.path.exists(mysql_bin):
-                    mysql_binary = mysql_bin
-                    mysql_dir = f'{path}/bin'
-                    # Set up compilation environment for macOS
-                    mysql_lib_path = f'{path}/lib'
-                    mysql_include_path = f'{path}/include/mysql'
-                    if os.path.exists(mysql_lib_path) and os.path.exists(mysql_include_path):
-                        os.environ['MYSQLCLIENT_CFLAGS'] = f"-I{mysql_include_path}"
-                        os.environ['MYSQLCLIENT_LDFLAGS'] = f"-L{mysql_lib_path} -lmysqlclient"
-                        cprint("✓ Set MySQL compilation environment variables", 3)
-                    break
+        path = _find_homebrew_mysql() if _SYSTEM == "Darwin" else None  # macOS
+        if path:
+            mysql_binary = f'{path}/bin/mysql'
+            mysql_dir = f'{path}/bin'
+            # Set up compilation environment for macOS
+            mysql_lib_path = f'{path}/lib'
+            mysql_include_path = f'{path}/include/mysql'
+            if os.path.exists(mysql_lib_path) and os.path.exists(mysql_include_path):
+                os.environ['MYSQLCLIENT_CFLAGS'] = f"-I{mysql_include_path}"
+                os.environ['MYSQLCLIENT_LDFLAGS'] = f"-L{mysql_lib_path} -lmysqlclient"
+                cprint("✓ Set MySQL compilation environment variables", 3)
 
     if not mysql_binary:
         cprint("ERROR: Could not locate mysql binary", 1)
@@ -207,9 +286,8 @@ def setup_mysql_path():
         cprint(f"✓ Added {mysql_dir} to PATH", 3)
 
     # Create mariadb TCP wrapper script (cross-platform)
-    local_bin = os.path.expanduser('~/bin')
-    os.makedirs(local_bin, exist_ok=True)
-    mariadb_script = os.path.join(local_bin, 'mariadb')
+    os.makedirs(_LOCAL_BIN, exist_ok=True)
+    mariadb_script = os.path.join(_LOCAL_BIN, 'mariadb')
 
     wrapper_content = f"""#!/bin/bash
 # Wrapper for mariadb to force TCP connection instead of socket
@@ -217,21 +295,66 @@ exec {mysql_binary} --protocol=TCP "$@"
 """
 
     try:
-        with open(mariadb_script, 'w') as f:
-            f.write(wrapper_content)
-        os.chmod(mariadb_script, 0o755)
-        cprint("✓ Created mariadb TCP wrapper", 3)
-    except Exception as e:
+        wrapper_bytes = wrapper_content.encode()
+        try:
+            st = os.stat(mariadb_script)
+        except FileNotFoundError:
+            st = None
+
+        # Only read the existing wrapper back when its size already matches
+        up_to_date = False
+        if st is not None and st.st_size == len(wrapper_bytes):
+            with open(mariadb_script, 'rb') as f:
+                up_to_date = f.read() == wrapper_bytes
+
+        if up_to_date:
+            cprint("✓ mariadb TCP wrapper up to date", 3)
+        else:
+            with open(mariadb_script, 'wb') as f:
+                f.write(wrapper_bytes)
+            cprint("✓ Created mariadb TCP wrapper", 3)
+
+        # A rewrite keeps the existing mode, so only chmod a new file or one
+        # whose mode has drifted
+        if st is None or st.st_mode & 0o777 != 0o755:
+            os.chmod(mariadb_script, 0o755)
+    except OSError as e:
         cprint(f"Warning: Could not create mariadb wrapper: {e}", 3)
 
     # Add ~/bin to PATH
-    if local_bin not in os.environ.get('PATH', ''):
-        os.environ['PATH'] = f"{local_bin}:{os.environ.get('PATH', '')}"
+    if _LOCAL_BIN not in os.environ.get('PATH', ''):
+        os.environ['PATH'] = f"{_LOCAL_BIN}:{os.environ.get('PATH', '')}"
         cprint("✓ Added ~/bin to PATH", 3)
 
+    # PATH may have changed, drop stale lookups
+    _which.cache_clear()
+    _bench_env.cache_clear()
     return True
 
 
+def add_git_safe_directories(directories):
+    """Append missing safe.directory entries to the global gitconfig in one write"""
+    gitconfig = os.environ.get('GIT_CONFIG_GLOBAL') or os.path.expanduser('~/.gitconfig')
+    try:
+        # Only used for membership checks, so undecodable bytes can't matter
+        with open(gitconfig, 'r', errors='replace') as f:
+            existing = f.read()
+    except FileNotFoundError:
+        existing = ''
+
+    configured = {line.strip() for line in existing.splitlines()}
+    missing = [d for d in directories if f"directory = {d}" not in configured]
+    if not missing:
+        return
+
+    with open(gitconfig, 'a') as f:
+        if existing and not existing.endswith('\n'):
+            f.write('\n')
+        f.write('[safe]\n')
+        for safe_dir in missing:
+            f.write(f'\tdirectory = {safe_dir}\n')
+
+
 def init_bench_if_not_exist(args):
     """Initialize bench if it doesn't exist"""
     if os.path.exists(args.bench_name):
@@ -240,34 +363,29 @@ def init_bench_if_not_exist(args):
     
     try:
         cprint(f"Creating new bench '{args.bench_name}'...", 2)
-        env = os.environ.copy()
-        
         # Fix git safe directory issues for apps
         cprint("Configuring git safe directories...", level=3)
         git_safe_dirs = [
             f"/workspace/development/{args.bench_name}/apps/erpnext",
             f"/workspace/development/{args.bench_name}/apps/frappe",
         ]
-        for safe_dir in git_safe_dirs:
-            try:
-                subprocess.call(
-                    ["git", "config", "--global", "--add", "safe.directory", safe_dir],
-                    cwd=os.getcwd(),
-                )
-            except subprocess.CalledProcessError:
-                pass  # Continue if git config fails
+        try:
+            add_git_safe_directories(git_safe_dirs)
+        except OSError as e:
+            cprint(f"Warning: Could not update git safe directories: {e}", 3)  # Continue anyway
         
         # Initialize bench (skip apps.json to avoid wrong branch)
-        init_command = "bench init --skip-redis-config-generation "
-        init_command += f"--frappe-path={args.frappe_repo} "
-        init_command += f"--frappe-branch={args.frappe_branch} "
-        # Skip apps.json to manually install ERPNext with correct branch
-        init_command += args.bench_name
-
-        cprint(f"Running: {init_command}", 3)
-        command = ["/bin/bash", "-c", init_command]
+        command = [
+            'bench', 'init', '--skip-redis-config-generation',
+            f'--frappe-path={args.frappe_repo}',
+            f'--frappe-branch={args.frappe_branch}',
+            # Skip apps.json to manually install ERPNext with correct branch
+            args.bench_name,
+        ]
+
+        cprint(f"Running: {' '.join(command)}", 3)
         # Show live output during bench initialization
-        result = subprocess.run(command, env=env, cwd=os.getcwd())
+        result = subprocess.run(command, env=_bench_env(), cwd=os.getcwd())
 
         if result.returncode != 0:
             cprint("Error initializing bench", 1)
@@ -276,11 +394,52 @@ def init_bench_if_not_exist(args):
         cprint("✓ Bench initialized successfully", 2)
         return True
         
-    except Exception as e:
+    except OSError as e:
         cprint(f"Error initializing bench: {e}", 1)
         return False
 
 
+def _write_site_config(path, config):
+    """Atomically replace a site config JSON file, keeping its permissions"""
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+
+    # Write to a unique sibling temp file and rename it over the original so
+    # readers never see a half-written config
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(json.dumps(config, indent=1, sort_keys=True).encode())
+        # mkstemp creates the file as 0600; site configs may hold db_password,
+        # so carry over whatever mode the original had
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _patch_site_config(path, updates):
+    """Merge updates into a site config JSON file atomically, return True if written
+
+    The file is left untouched when it already holds every update.
+    """
+    try:
+        with open(path, 'rb') as f:
+            config = json.loads(f.read())
+    except FileNotFoundError:
+        config = {}
+
+    if all(key in config and config[key] == value for key, value in updates.items()):
+        return False
+
+    config.update(updates)
+    _write_site_config(path, config)
+    return True
+
+
 def configure_bench(args=None):
     """Configure existing bench for container backend"""
     bench_name = args.bench_name if args else 'frappe-bench'
@@ -292,81 +451,85 @@ def configure_bench(args=None):
 
     cprint("Configuring frappe-bench for database backend...", 3)
 
-    bench_dir = bench_name
     if db_type == "mariadb":
-        config_commands = [
-            ['bench', 'set-config', '-g', 'db_host', 'localhost'],
-            ['bench', 'set-config', '-g', 'db_port', '3306'],
-            ['bench', 'set-config', '-g', 'db_socket', ''],
-            ['bench', 'set-config', '-g', 'db_type', 'mariadb'],
-            ['bench', 'set-config', '-g', 'redis_cache', 'redis://localhost:6379'],
-            ['bench', 'set-config', '-g', 'redis_queue', 'redis://localhost:6380'],
-            ['bench', 'set-config', '-g', 'redis_socketio', 'redis://localhost:6380'],
-            ['bench', 'set-config', '-g', 'developer_mode', '1'],
-        ]
+        common_config = {
+            'db_host': 'localhost',
+            'db_port': 3306,
+            'db_socket': '',
+            'db_type': 'mariadb',
+            'redis_cache': 'redis://localhost:6379',
+            'redis_queue': 'redis://localhost:6380',
+            'redis_socketio': 'redis://localhost:6380',
+            'developer_mode': 1,
+        }
     else:  # postgresql
-        config_commands = [
-            ['bench', 'set-config', '-g', 'db_host', 'localhost'],
-            ['bench', 'set-config', '-g', 'db_port', '5432'],
-            ['bench', 'set-config', '-g', 'db_type', 'postgres'],
-            ['bench', 'set-config', '-g', 'redis_cache', 'redis://localhost:6379'],
-            ['bench', 'set-config', '-g', 'redis_queue', 'redis://localhost:6380'],
-            ['bench', 'set-config', '-g', 'redis_socketio', 'redis://localhost:6380'],
-            ['bench', 'set-config', '-g', 'developer_mode', '1'],
-        ]
-    
-    for cmd in config_commands:
-        try:
-            result = subprocess.run(cmd, cwd=bench_dir, capture_output=True, text=True)
-            if result.returncode == 0:
-                cprint(f"✓ {' '.join(cmd[2:])}", 3)
-            else:
-                cprint(f"Warning: {' '.join(cmd)} failed: {result.stderr.strip()}", 3)
-        except Exception as e:
-            cprint(f"Error running {' '.join(cmd)}: {e}", 1)
-    
+        common_config = {
+            'db_host': 'localhost',
+            'db_port': 5432,
+            'db_type': 'postgres',
+            'redis_cache': 'redis://localhost:6379',
+            'redis_queue': 'redis://localhost:6380',
+            'redis_socketio': 'redis://localhost:6380',
+            'developer_mode': 1,
+        }
+
+    # Edit common_site_config.json in place instead of paying a full bench
+    # startup for every `bench set-config -g` call; a missing file is created
+    common_config_path = f'{bench_name}/sites/common_site_config.json'
+    try:
+        if _patch_site_config(common_config_path, common_config):
+            cprint(f"✓ Updated {common_config_path}: {', '.join(common_config)}", 3)
+        else:
+            cprint(f"✓ {common_config_path} already configured", 3)
+    except (OSError, ValueError) as e:
+        cprint(f"Error updating {common_config_path}: {e}", 1)
+
     # Also fix site-specific config if development.localhost exists
     site_config_path = f'{bench_name}/sites/development.localhost/site_config.json'
-    if os.path.exists(site_config_path):
+    try:
+        with open(site_config_path, 'rb') as f:
+            site_config_data = f.read()
+    except FileNotFoundError:
+        site_config_data = b''
+    except OSError as e:
+        cprint(f"Warning: Could not read site config: {e}", 3)
+        site_config_data = b''
+
+    # Only parse the config when its db_host may need fixing, so re-runs after
+    # the first skip the JSON round-trip entirely
+    if _STALE_DB_HOST_RE.search(site_config_data):
         cprint("Fixing site-specific database configuration...", 3)
         try:
-            import json
-            with open(site_config_path, 'r') as f:
-                site_config = json.load(f)
-
+            site_config = json.loads(site_config_data)
             # Fix both mariadb container and localhost socket issues
             if site_config.get('db_host') in ['mariadb', 'localhost']:
-                site_config['db_host'] = '127.0.0.1'
-                site_config['db_port'] = 3306
-                site_config['db_socket'] = ''
-                with open(site_config_path, 'w') as f:
-                    json.dump(site_config, f, indent=1)
+                site_config.update({'db_host': '127.0.0.1', 'db_port': 3306, 'db_socket': ''})
+                _write_site_config(site_config_path, site_config)
                 cprint("✓ Updated site config db_host to 127.0.0.1", 3)
-        except Exception as e:
+        except (OSError, ValueError) as e:
             cprint(f"Warning: Could not update site config: {e}", 3)
-    
+
     return True
 
 
 def check_apps(args=None):
-    """Check what apps are installed"""
+    """Check what apps are installed, scan once and pass the result around"""
     bench_name = args.bench_name if args else 'frappe-bench'
-    if not os.path.exists(f'{bench_name}/apps'):
-        return []
-    
-    apps = []
-    for item in os.listdir(f'{bench_name}/apps'):
-        if os.path.isdir(f'{bench_name}/apps/{item}'):
-            apps.append(item)
-    
-    cprint(f"Apps found: {', '.join(apps)}", 3)
-    return apps
+    try:
+        with os.scandir(f'{bench_name}/apps') as entries:
+            apps = [entry.name for entry in entries if entry.is_dir()]
+    except FileNotFoundError:
+        return frozenset()
+
+    cprint(f"Apps found: {', '.join(sorted(apps))}", 3)
+    return frozenset(apps)
 
 
-def install_erpnext_if_missing(args=None):
+async def install_erpnext_if_missing(args=None, apps=None):
     """Install ERPNext if not present"""
     bench_name = args.bench_name if args else 'frappe-bench'
-    apps = check_apps(args)
+    if apps is None:
+        apps = check_apps(args)
 
     if 'erpnext' not in apps:
         cprint("Installing ERPNext...", 3)
@@ -374,14 +537,13 @@ def install_erpnext_if_missing(args=None):
             cmd = ['bench', 'get-app', '--branch', 'develop-next', 'erpnext', 'https://github.com/karlorz/erpnext']
             cprint(f"Running: {' '.join(cmd)}", 3)
             # Show live output during installation
-            result = subprocess.run(cmd, cwd=bench_name)
-            if result.returncode == 0:
+            if await run_logged(cmd, 'installer-get-app', cwd=bench_name) == 0:
                 cprint("✓ ERPNext installed successfully", 2)
                 return True
             else:
                 cprint("Error installing ERPNext", 1)
                 return False
-        except Exception as e:
+        except OSError as e:
             cprint(f"Error installing ERPNext: {e}", 1)
             return False
     else:
@@ -414,26 +576,58 @@ def create_site_config_manually(bench_name, site_name, db_type="mariadb"):
 
     config_path = f"{site_dir}/site_config.json"
     try:
-        import json
-        with open(config_path, 'w') as f:
-            json.dump(site_config, f, indent=1)
+        _write_site_config(config_path, site_config)
         cprint(f"✓ Created site config for TCP connection: {config_path}", 3)
         return True
-    except Exception as e:
+    except (OSError, ValueError) as e:
         cprint(f"Warning: Could not create site config: {e}", 3)
         return False
 
 
-def create_site(args=None, recreate=False):
+async def drop_site(args=None, has_config=None):
+    """Drop the development site, warning instead of failing if bench cannot"""
+    bench_name = args.bench_name if args else 'frappe-bench'
+    site_name = args.site_name if args else "development.localhost"
+
+    if has_config is None:
+        has_config = os.path.exists(f"{bench_name}/sites/{site_name}/site_config.json")
+
+    # A site dir without site_config.json is left over from an aborted run:
+    # drop-site has no database to find, and new-site --force reuses the dir
+    if not has_config:
+        cprint(f"No site_config.json for {site_name}, skipping drop-site", 3)
+        return
+
+    cprint(f"Dropping existing site {site_name}...", 3)
+    try:
+        cmd = ['bench', 'drop-site', site_name, '--force', '--db-root-password=123']
+        # Only stderr is reported, so let stdout go straight to /dev/null
+        process = await asyncio.create_subprocess_exec(
+            *cmd, cwd=bench_name, env=_bench_env(), stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+        )
+        _, stderr = await process.communicate()
+        if process.returncode != 0:  # Don't fail if drop fails
+            cprint(f"Warning: Could not drop site {site_name}: {stderr.decode(errors='replace').strip()}", 3)
+    except OSError as e:
+        cprint(f"Warning: Could not drop site {site_name}: {e}", 3)
+
+
+async def create_site(args=None, recreate=False):
     """Create or recreate the development site"""
     bench_name = args.bench_name if args else 'frappe-bench'
     site_name = args.site_name if args else "development.localhost"
     admin_password = args.admin_password if args else "admin"
     db_type = args.db_type if args else "mariadb"
 
-    # Check if site exists
+    # Check if site exists; one directory read also tells whether it has a config
     site_path = f"{bench_name}/sites/{site_name}"
-    if os.path.exists(site_path):
+    try:
+        with os.scandir(site_path) as entries:
+            site_files = {entry.name for entry in entries}
+    except FileNotFoundError:
+        site_files = None
+
+    if site_files is not None:
         if not recreate:
             cprint(f"✓ Site {site_name} already exists", 2)
             cprint("✓ Login: Administrator / admin", 2)
@@ -442,23 +636,15 @@ def create_site(args=None, recreate=False):
             cprint(f"Site {site_name} exists, recreating...", 3)
 
         # Drop existing site
-        cprint(f"Dropping existing site {site_name}...", 3)
-        try:
-            env = os.environ.copy()
-            env['PATH'] = f"{os.path.expanduser('~/bin')}:/opt/homebrew/opt/mysql-client/bin:{env.get('PATH', '')}"
-            cmd = ['bench', 'drop-site', site_name, '--force', '--db-root-password=123']
-            subprocess.run(cmd, cwd=bench_name, env=env, check=False)  # Don't fail if drop fails
-        except:
-            pass
+        await drop_site(args, has_config='site_config.json' in site_files)
 
     # Let bench create the site first, then fix config afterward
     
     # Create new site
     cprint(f"Creating site {site_name}...", 3)
     try:
-        env = os.environ.copy()
-        env['PATH'] = f"{os.path.expanduser('~/bin')}:/opt/homebrew/opt/mysql-client/bin:{env.get('PATH', '')}"
-        
+        env = _bench_env()
+
         if db_type == "mariadb":
             cmd = [
                 'bench', 'new-site',
@@ -487,8 +673,7 @@ def create_site(args=None, recreate=False):
 
         cprint(f"Running: {' '.join(cmd)}", 3)
         # Show live output during site creation
-        result = subprocess.run(cmd, cwd=bench_name, env=env)
-        if result.returncode == 0:
+        if await run_logged(cmd, 'installer-new-site', cwd=bench_name, env=env) == 0:
             cprint(f"✓ Site {site_name} created successfully!", 2)
 
             # Install ERPNext separately
@@ -496,8 +681,7 @@ def create_site(args=None, recreate=False):
             cmd = ['bench', '--site', site_name, 'install-app', 'erpnext']
             cprint(f"Running: {' '.join(cmd)}", 3)
             # Show live output during app installation
-            result = subprocess.run(cmd, cwd=bench_name, env=env)
-            if result.returncode == 0:
+            if await run_logged(cmd, 'installer-install-app', cwd=bench_name, env=env) == 0:
                 cprint("✓ ERPNext installed successfully!", 2)
                 cprint("✓ Login: Administrator / admin", 2)
                 return True
@@ -508,7 +692,7 @@ def create_site(args=None, recreate=False):
         else:
             cprint("Error creating site", 1)
             return False
-    except Exception as e:
+    except OSError as e:
         cprint(f"Error creating site: {e}", 1)
         return False
 
@@ -595,27 +779,25 @@ def get_args_parser():
     return parser
 
 
-def main():
+async def main():
     """Main setup function"""
     parser = get_args_parser()
     args = parser.parse_args()
 
     cprint("=== Native Frappe Development Setup ===", 2)
 
-    # Check prerequisites
-    if not check_uv_environment():
+    # Check prerequisites (independent, read-only checks run concurrently)
+    checks = [check_uv_environment]
+    if args.db_type == "mariadb":
+        checks += [check_mysql_client, partial(check_database_service, args.db_type)]
+    if not run_checks(*checks):
         sys.exit(1)
 
-    # MySQL client tools only needed for MariaDB
+    # MySQL client tools only needed for MariaDB. setup_mysql_path writes the
+    # wrapper and mutates PATH, so it only runs once every check has passed
     if args.db_type == "mariadb":
-        if not check_mysql_client():
-            sys.exit(1)
-
         if not setup_mysql_path():
             sys.exit(1)
-
-        if not check_database_service(args.db_type):
-            sys.exit(1)
     else:
         cprint(f"Using {args.db_type} database - skipping MySQL client setup", 3)
     
@@ -623,16 +805,23 @@ def main():
     if not init_bench_if_not_exist(args):
         sys.exit(1)
     
-    # Configure bench
-    if not configure_bench(args):
+    apps = check_apps(args)
+
+    # Configure bench (local disk) and probe redis while ERPNext is fetched
+    # (network) if missing
+    configured, installed, _ = await asyncio.gather(
+        asyncio.to_thread(configure_bench, args),
+        install_erpnext_if_missing(args, apps),
+        asyncio.to_thread(check_redis_service),
+    )
+    if not configured:
         sys.exit(1)
-    
-    # Install ERPNext if missing
-    if not install_erpnext_if_missing(args):
+
+    if not installed:
         cprint("Failed to install ERPNext, continuing anyway...", 3)
     
     # Create site
-    if create_site(args, recreate=args.recreate_site):
+    if await create_site(args, recreate=args.recreate_site):
         show_usage()
     else:
         cprint("Site creation failed. Check container services are running.", 1)
@@ -640,4 +829,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file